@@ -1,17 +1,26 @@
 """API routes."""
 
-from flask import Blueprint, request, jsonify, session
-from backend.services.auth_service import AuthService
-from backend.services.aws_service import AWSService
+from functools import lru_cache
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
 
 api = Blueprint('api', __name__)
-auth_service = AuthService()
-aws_service = AWSService()
+
+@lru_cache(maxsize=None)
+def get_auth_service():
+    """Create the auth service on first use so startup does not build AWS clients."""
+    from backend.services.auth_service import AuthService
+    return AuthService()
+
+@lru_cache(maxsize=None)
+def get_aws_service():
+    """Create the AWS service on first use so startup does not build AWS clients."""
+    from backend.services.aws_service import AWSService
+    return AWSService()
 
 @api.route('/auth/register', methods=['POST'])
 def register():
     data = request.json
-    success, error = auth_service.register(
+    success, error = get_auth_service().register(
         data['username'], 
         data['email'], 
         data['password']
@@ -21,7 +30,7 @@ def register():
 @api.route('/auth/login', methods=['POST'])
 def login():
     data = request.json
-    success, user = auth_service.login(data['username'], data['password'])
+    success, user = get_auth_service().login(data['username'], data['password'])
     
     if success:
         session['user_id'] = user['user_id']
@@ -45,7 +54,7 @@ def upload():
     if not file:
         return jsonify({'error': 'No file'}), 400
     
-    doc_id, text = aws_service.save_document(
+    doc_id, text, timestamp = get_aws_service().save_document(
         session['user_id'],
         session['patient_id'],
         file.filename,
@@ -53,7 +62,16 @@ def upload():
     )
     
     if doc_id:
-        return jsonify({'success': True, 'doc_id': doc_id, 'text': text[:500]})
+        return jsonify({
+            'success': True,
+            'doc_id': doc_id,
+            'text': text[:500],
+            'document': {
+                'id': doc_id,
+                'name': file.filename,
+                'date': timestamp[:10]
+            }
+        })
     return jsonify({'error': text}), 400
 
 @api.route('/documents/list', methods=['GET'])
@@ -61,7 +79,7 @@ def list_documents():
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    docs = aws_service.get_user_documents(session['user_id'])
+    docs = get_aws_service().get_user_documents(session['user_id'])
     return jsonify({
         'documents': [{
             'id': d['document_id'],
@@ -76,5 +94,14 @@ def chat():
         return jsonify({'error': 'Unauthorized'}), 401
     
     message = request.json.get('message')
-    response = aws_service.chat_with_context(message, session['user_id'])
+    response = get_aws_service().chat_with_context(message, session['user_id'])
     return jsonify({'response': response})
+
+@api.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    message = request.json.get('message')
+    chunks = get_aws_service().chat_with_context_stream(message, session['user_id'])
+    return Response(stream_with_context(chunks), mimetype='text/plain')
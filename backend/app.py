@@ -1,6 +1,7 @@
 """Main Flask application."""
 
 from flask import Flask, render_template, session, redirect, url_for
+from datetime import timedelta
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +11,16 @@ app = Flask(__name__,
             template_folder='../frontend/templates',
             static_folder='../frontend/static')
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'change-this-secret-key')
+# Let browsers reuse the stylesheet instead of revalidating it on every page load
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = timedelta(hours=1)
+
+@app.url_defaults
+def version_static_urls(endpoint, values):
+    """Add the file's modification time to static URLs so a deploy busts browser caches."""
+    if endpoint == 'static' and 'filename' in values:
+        path = os.path.join(app.static_folder, values['filename'])
+        if os.path.isfile(path):
+            values['v'] = int(os.stat(path).st_mtime)
 
 # Register API routes
 from backend.api.routes import api
@@ -29,6 +40,3 @@ def login():
 def logout():
     session.clear()
     return redirect(url_for('login'))
-
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
@@ -3,6 +3,7 @@
 import boto3
 import json
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import uuid
 import os
@@ -10,6 +11,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Documents below this size are summarized in one call; larger ones are map-reduced
+SUMMARY_SINGLE_CALL_CHARS = 150_000
+SUMMARY_CHUNK_CHARS = 80_000
+
 class AWSService:
     def __init__(self):
         region = os.getenv('AWS_DEFAULT_REGION', 'us-west-2')
@@ -21,9 +26,11 @@ class AWSService:
         self.bucket = 'health-companion-fhir-data'
         self.users_table = self.dynamodb.Table('HealthCompanionUsers')
         self.docs_table = self.dynamodb.Table('MedicalDocuments')
+        
+        self._background = ThreadPoolExecutor(max_workers=2)
     
     def save_document(self, user_id, patient_id, file_name, file_data):
-        """Save document to S3 and extract text."""
+        """Save document to S3 and extract text; returns (doc_id, text, upload_timestamp)."""
         doc_hash = hashlib.md5(file_data).hexdigest()
         
         # Check duplicate
@@ -34,7 +41,7 @@ class AWSService:
                 ExpressionAttributeValues={':uid': user_id, ':hash': doc_hash}
             )
             if existing.get('Items'):
-                return None, "Duplicate document"
+                return None, "Duplicate document", None
         except:
             pass
         
@@ -47,9 +54,14 @@ class AWSService:
         
         # Extract text
         extracted_text = ""
+        pages = []
         try:
-            response = self.textract.detect_document_text(Document={'Bytes': file_data})
-            extracted_text = "\n".join([b['Text'] for b in response['Blocks'] if b['BlockType'] == 'LINE'])
+            if file_name.lower().endswith('.pdf'):
+                pages = self.extract_pdf_pages(file_data)
+                extracted_text = "\n".join(pages)
+            if not extracted_text.strip():
+                response = self.textract.detect_document_text(Document={'Bytes': file_data})
+                extracted_text = "\n".join([b['Text'] for b in response['Blocks'] if b['BlockType'] == 'LINE'])
         except:
             extracted_text = "Text extraction failed"
         
@@ -65,7 +77,78 @@ class AWSService:
             'extracted_text': extracted_text[:1000]
         })
         
-        return doc_id, extracted_text
+        # Summarize the whole document off the request path so chat context is not
+        # limited to its first lines; chat falls back to the raw text until it lands
+        if len(pages) > 1 and any(page.strip() for page in pages):
+            self._background.submit(self._store_summary, user_id, doc_id, pages)
+        
+        return doc_id, extracted_text, timestamp
+    
+    def extract_pdf_pages(self, file_data):
+        """Extract the embedded text layer of each PDF page with PyMuPDF."""
+        import fitz
+        doc = fitz.open(stream=file_data, filetype="pdf")
+        try:
+            return [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+    
+    def _store_summary(self, user_id, doc_id, pages):
+        """Summarize a document and attach the summary to its metadata item."""
+        try:
+            self.docs_table.update_item(
+                Key={'user_id': user_id, 'document_id': doc_id},
+                UpdateExpression='SET summary = :summary',
+                ExpressionAttributeValues={':summary': self.summarize_pages(pages)}
+            )
+        except:
+            pass
+    
+    def summarize_pages(self, pages):
+        """Summarize a multi-page document, map-reducing when it is too long for one call."""
+        blocks = [f"=== Page {i} ===\n{text}" for i, text in enumerate(pages, 1) if text.strip()]
+        if sum(len(b) for b in blocks) < SUMMARY_SINGLE_CALL_CHARS:
+            return self._summarize("\n".join(blocks))
+        
+        chunks, current, size = [], [], 0
+        for block in blocks:
+            if current and size + len(block) > SUMMARY_CHUNK_CHARS:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(block)
+            size += len(block)
+        if current:
+            chunks.append("\n".join(current))
+        
+        with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as pool:
+            partials = list(pool.map(self._summarize, chunks))
+        
+        return self._invoke_text(
+            "Merge these partial summaries of one medical document into a single "
+            "concise summary. Keep every test value, medication, dosage and date.\n\n"
+            + "\n\n".join(partials)
+        )
+    
+    def _summarize(self, document_text):
+        """Summarize page-marked document text in one Bedrock call."""
+        return self._invoke_text(
+            "Summarize this medical document for later questions from the patient. "
+            "Keep every test value, medication, dosage and date, and note which page "
+            f"each comes from.\n\n{document_text}"
+        )
+    
+    def _invoke_text(self, prompt, max_tokens=1000):
+        """Send a single-turn text prompt to Claude and return the reply."""
+        response = self.bedrock.invoke_model(
+            modelId='anthropic.claude-3-sonnet-20240229-v1:0',
+            body=json.dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": prompt}]
+            })
+        )
+        result = json.loads(response['body'].read())
+        return result['content'][0]['text']
     
     def get_user_documents(self, user_id, limit=10):
         """Get user's documents from DynamoDB."""
@@ -82,11 +165,41 @@ class AWSService:
     
     def chat_with_context(self, message, user_id):
         """Chat with Bedrock using user's documents as context."""
+        prompt = self._build_chat_prompt(message, user_id)
+        
+        try:
+            return self._invoke_text(prompt)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    def chat_with_context_stream(self, message, user_id):
+        """Chat with Bedrock using user's documents as context, yielding text as it arrives."""
+        prompt = self._build_chat_prompt(message, user_id)
+        
+        try:
+            response = self.bedrock.invoke_model_with_response_stream(
+                modelId='anthropic.claude-3-sonnet-20240229-v1:0',
+                body=json.dumps({
+                    "anthropic_version": "bedrock-2023-05-31",
+                    "max_tokens": 1000,
+                    "messages": [{"role": "user", "content": prompt}]
+                })
+            )
+            for event in response['body']:
+                chunk = json.loads(event['chunk']['bytes'])
+                if chunk['type'] == 'content_block_delta':
+                    yield chunk['delta'].get('text', '')
+        except Exception as e:
+            yield f"Error: {str(e)}"
+    
+    def _build_chat_prompt(self, message, user_id):
+        """Build the chat prompt with the user's recent documents as context."""
         # Get documents
         docs = self.get_user_documents(user_id, limit=5)
         context = "\n\nPatient's Medical Documents:\n"
         for doc in docs:
-            context += f"- {doc['file_name']}: {doc.get('extracted_text', '')[:200]}\n"
+            content = doc.get('summary') or doc.get('extracted_text', '')[:200]
+            context += f"- {doc['file_name']}: {content}\n"
         
         prompt = f"""You are a health assistant. When comparing lab results or medical data, format comparisons as HTML tables. Use this exact format with NO extra newlines before or after the table:
 
@@ -96,16 +209,4 @@ Patient asks: {message}{context}
 
 Provide clear, empathetic response. Put tables directly after text with no blank lines."""
         
-        try:
-            response = self.bedrock.invoke_model(
-                modelId='anthropic.claude-3-sonnet-20240229-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 1000,
-                    "messages": [{"role": "user", "content": prompt}]
-                })
-            )
-            result = json.loads(response['body'].read())
-            return result['content'][0]['text']
-        except Exception as e:
-            return f"Error: {str(e)}"
+        return prompt
@@ -3,8 +3,8 @@
 import boto3
 import json
 import base64
-from typing import Optional, List, Dict
-from config import AWS_REGION, BEDROCK_MODEL_ID, MAX_TOKENS, TEMPERATURE, KNOWLEDGE_BASE_ID, KNOWLEDGE_BASE_ENABLED
+from typing import Optional, List, Dict, Iterator
+from config import AWS_REGION, BEDROCK_MODEL_ID, EMBEDDING_MODEL_ID, MAX_TOKENS, TEMPERATURE, KNOWLEDGE_BASE_ID, KNOWLEDGE_BASE_ENABLED
 
 
 class BedrockClient:
@@ -15,19 +15,54 @@ class BedrockClient:
         self.client = boto3.client('bedrock-runtime', region_name=AWS_REGION)
         self.agent_client = boto3.client('bedrock-agent-runtime', region_name=AWS_REGION)
     
-    def invoke_text(self, prompt: str, system_prompt: str = "") -> str:
+    def invoke_text(self, prompt: str, system_prompt: str = "", model_id: Optional[str] = None,
+                    max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
         """
         Invoke Bedrock model with text-only input.
         
         Args:
             prompt: User's text prompt
             system_prompt: System instructions for the model
+            model_id: Bedrock model to use instead of the default
+            max_tokens: Generation limit instead of the default
+            temperature: Sampling temperature instead of the default
             
         Returns:
             Model's text response
         """
         messages = [{"role": "user", "content": prompt}]
         
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": MAX_TOKENS if max_tokens is None else max_tokens,
+            "messages": messages,
+            "temperature": TEMPERATURE if temperature is None else temperature
+        }
+        
+        if system_prompt:
+            body["system"] = system_prompt
+        
+        response = self.client.invoke_model(
+            modelId=model_id or BEDROCK_MODEL_ID,
+            body=json.dumps(body)
+        )
+        
+        result = json.loads(response['body'].read())
+        return result['content'][0]['text']
+    
+    def invoke_text_stream(self, prompt: str, system_prompt: str = "") -> Iterator[str]:
+        """
+        Invoke Bedrock model with text-only input, streaming the reply.
+        
+        Args:
+            prompt: User's text prompt
+            system_prompt: System instructions for the model
+            
+        Yields:
+            Text deltas of the model's response as they are generated
+        """
+        messages = [{"role": "user", "content": prompt}]
+        
         body = {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": MAX_TOKENS,
@@ -38,13 +73,33 @@ class BedrockClient:
         if system_prompt:
             body["system"] = system_prompt
         
-        response = self.client.invoke_model(
+        response = self.client.invoke_model_with_response_stream(
             modelId=BEDROCK_MODEL_ID,
             body=json.dumps(body)
         )
         
+        for event in response['body']:
+            chunk = json.loads(event['chunk']['bytes'])
+            if chunk['type'] == 'content_block_delta':
+                yield chunk['delta'].get('text', '')
+    
+    def embed_text(self, text: str) -> List[float]:
+        """
+        Embed text with the Bedrock Titan embeddings model.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Normalized embedding vector
+        """
+        response = self.client.invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            body=json.dumps({"inputText": text, "normalize": True})
+        )
+        
         result = json.loads(response['body'].read())
-        return result['content'][0]['text']
+        return result['embedding']
     
     def retrieve_from_knowledge_base(self, query: str, max_results: int = 5) -> List[Dict]:
         """
@@ -100,7 +155,8 @@ class BedrockClient:
         return self.invoke_text(enhanced_prompt, system_prompt)
     
     def invoke_with_image(self, prompt: str, image_data: bytes, 
-                         media_type: str, system_prompt: str = "") -> str:
+                         media_type: str, system_prompt: str = "", model_id: Optional[str] = None,
+                         max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
         """
         Invoke Bedrock model with image and text input.
         
@@ -109,12 +165,41 @@ class BedrockClient:
             image_data: Binary image data
             media_type: Image MIME type (e.g., 'image/jpeg')
             system_prompt: System instructions for the model
+            model_id: Bedrock model to use instead of the default
+            max_tokens: Generation limit instead of the default
+            temperature: Sampling temperature instead of the default
             
         Returns:
             Model's text response analyzing the image
         """
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        return self.invoke_with_b64image(
+            prompt=prompt,
+            image_base64=base64.b64encode(image_data).decode('utf-8'),
+            media_type=media_type,
+            system_prompt=system_prompt,
+            model_id=model_id,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+    
+    def invoke_with_b64image(self, prompt: str, image_base64: str,
+                             media_type: str, system_prompt: str = "", model_id: Optional[str] = None,
+                             max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
+        """
+        Invoke Bedrock model with an already base64-encoded image and text input.
         
+        Args:
+            prompt: User's text prompt
+            image_base64: Base64-encoded image data
+            media_type: Image MIME type (e.g., 'image/jpeg')
+            system_prompt: System instructions for the model
+            model_id: Bedrock model to use instead of the default
+            max_tokens: Generation limit instead of the default
+            temperature: Sampling temperature instead of the default
+            
+        Returns:
+            Model's text response analyzing the image
+        """
         messages = [{
             "role": "user",
             "content": [
@@ -135,16 +220,16 @@ class BedrockClient:
         
         body = {
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": MAX_TOKENS,
+            "max_tokens": MAX_TOKENS if max_tokens is None else max_tokens,
             "messages": messages,
-            "temperature": TEMPERATURE
+            "temperature": TEMPERATURE if temperature is None else temperature
         }
         
         if system_prompt:
             body["system"] = system_prompt
         
         response = self.client.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
+            modelId=model_id or BEDROCK_MODEL_ID,
             body=json.dumps(body)
         )
         
@@ -1,7 +1,21 @@
 """Chat handler module for managing patient conversations."""
 
+from functools import lru_cache
+from typing import Iterator
+
 from bedrock_client import BedrockClient
-from config import KNOWLEDGE_BASE_ENABLED
+from config import KNOWLEDGE_BASE_ENABLED, CHAT_CACHE_TTL, CHAT_CACHE_SIMILARITY
+from response_cache import SemanticCache
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> SemanticCache:
+    """Return the process-wide chat response cache shared by all handlers."""
+    return SemanticCache(
+        embed_fn=BedrockClient().embed_text,
+        threshold=CHAT_CACHE_SIMILARITY,
+        ttl=CHAT_CACHE_TTL
+    )
 
 
 class ChatHandler:
@@ -10,6 +24,7 @@ class ChatHandler:
     def __init__(self):
         """Initialize with Bedrock client."""
         self.bedrock = BedrockClient()
+        self.cache = get_response_cache()
         self.system_prompt = """You are a compassionate AI health companion assistant. Your role:
 
 1. Interact with patients in a friendly, empathetic manner
@@ -40,6 +55,43 @@ Important guidelines:
         if context:
             prompt = f"Context: {context}\n\nPatient: {user_message}"
         
+        # Semantic matches are only reused for the same document context, never across patients
+        return self.cache.get_or_compute(
+            prompt, lambda: self._invoke(prompt),
+            query=user_message, scope=context
+        )
+    
+    def get_response_stream(self, user_message: str, context: str = "") -> Iterator[str]:
+        """
+        Generate AI response to patient's message, streaming it as it is produced.
+        
+        Args:
+            user_message: Patient's question or message
+            context: Additional context (e.g., previous analysis)
+            
+        Yields:
+            Text deltas of the assistant's response
+        """
+        prompt = user_message
+        if context:
+            prompt = f"Context: {context}\n\nPatient: {user_message}"
+        
+        # Knowledge base retrieval needs the full prompt up front, so it is not streamed
+        if KNOWLEDGE_BASE_ENABLED:
+            yield self.get_response(user_message, context)
+            return
+        
+        yield from self.cache.stream_through(
+            prompt,
+            lambda: self.bedrock.invoke_text_stream(
+                prompt=prompt,
+                system_prompt=self.system_prompt
+            ),
+            query=user_message, scope=context
+        )
+    
+    def _invoke(self, prompt: str) -> str:
+        """Send the prompt to Bedrock, bypassing the response cache."""
         # Use knowledge base if enabled, otherwise standard text invocation
         if KNOWLEDGE_BASE_ENABLED:
             return self.bedrock.invoke_with_knowledge_base(
@@ -12,8 +12,17 @@ AWS_SECRET_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 
 # Bedrock Model Configuration
 BEDROCK_MODEL_ID = 'anthropic.claude-3-5-sonnet-20241022-v2:0'
+CLASSIFIER_MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
 MAX_TOKENS = 2048
 TEMPERATURE = 0.7
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+
+# Response Cache Configuration
+CHAT_CACHE_TTL = 60 * 60
+CHAT_CACHE_SIMILARITY = 0.92
+ANALYSIS_CACHE_TTL = 7 * 24 * 60 * 60
+PREPARED_IMAGE_CACHE_TTL = 60 * 60
+TEXTRACT_CACHE_TTL = 24 * 60 * 60
 
 # Knowledge Base Configuration
 KNOWLEDGE_BASE_ID = os.getenv('KNOWLEDGE_BASE_ID', '')
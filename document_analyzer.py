@@ -1,8 +1,178 @@
 """Document analysis module for categorizing and processing medical documents."""
 
+import base64
+import hashlib
+import io
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional, Tuple
+
+from PIL import Image, ImageOps
+
 from bedrock_client import BedrockClient
-from textract_extractor import TextractExtractor
-from config import DOCUMENT_CATEGORIES
+from textract_extractor import get_textract_extractor
+from config import DOCUMENT_CATEGORIES, ANALYSIS_CACHE_TTL, PREPARED_IMAGE_CACHE_TTL, CLASSIFIER_MODEL_ID
+from response_cache import TTLCache
+
+# Bump whenever a prompt in this module changes so stale cached answers are ignored
+PROMPT_VERSION = 3
+
+# Phrases in the user's own request that name the document type outright
+CATEGORY_HINTS = {
+    'prescription': re.compile(r"\b(prescriptions?|rx|medicat\w+)\b"),
+    'lab_report': re.compile(r"\b(labs?|blood tests?|cbc|panels?|results?)\b"),
+    'medical_image': re.compile(r"\b(x-?rays?|mris?|ct scans?|ultrasounds?|scans?)\b")
+}
+
+
+def category_from_prompt(user_prompt: str) -> Optional[str]:
+    """
+    Infer the document category from the user's request without calling a model.
+    
+    Args:
+        user_prompt: What the user asked about the document
+        
+    Returns:
+        Category name if exactly one category is mentioned, otherwise None
+    """
+    text = user_prompt.lower()
+    matches = [category for category, pattern in CATEGORY_HINTS.items() if pattern.search(text)]
+    return matches[0] if len(matches) == 1 else None
+
+
+# Prompt templates, built once at import; bump PROMPT_VERSION when editing them
+_CATEGORIZE_PROMPT = """Extracted text from document:
+{extracted_text}
+
+Categorize this medical document into ONE of these types:
+1. PRESCRIPTION - Contains medication names, dosages, doctor's signature
+2. LAB_REPORT - Contains test results, lab values, pathology findings
+3. MEDICAL_IMAGE - X-ray, MRI, CT scan, ultrasound, or other diagnostic imaging
+
+Respond with ONLY: PRESCRIPTION, LAB_REPORT, or MEDICAL_IMAGE"""
+
+_CATEGORIZE_SYSTEM = "You are a medical document classifier. Respond only with the category name."
+
+_PRESCRIPTION_PROMPT = """{context}
+
+Based on the extracted prescription data above, explain:
+1. Medications prescribed (names and purposes)
+2. Dosage instructions in simple terms
+3. Duration of treatment
+4. Important precautions or side effects
+5. When to take each medication
+
+Use simple, patient-friendly language."""
+
+_PRESCRIPTION_SYSTEM = "You are a compassionate healthcare assistant explaining prescriptions to patients."
+
+_LAB_PROMPT = """{context}
+
+Based on the extracted lab report data above, explain:
+1. What tests were performed
+2. Key findings and values
+3. Which values are normal vs abnormal
+4. What abnormal values might indicate
+5. General health implications
+
+Use simple language that patients can understand."""
+
+_LAB_SYSTEM = "You are a healthcare assistant explaining lab results to patients in simple terms."
+
+_IMAGE_PROMPT = """Analyze this medical image and explain:
+1. Type of imaging (X-ray, MRI, CT, etc.)
+2. Body part or area being examined
+3. Visible findings or abnormalities
+4. What these findings might mean
+5. General observations
+
+Use simple, reassuring language."""
+
+_IMAGE_SYSTEM = "You are a healthcare assistant explaining medical images to patients."
+
+_PRESCRIPTION_VISION_PROMPT = """Read this prescription and explain:
+1. Medications prescribed (names and purposes)
+2. Dosage instructions in simple terms
+3. Duration of treatment
+4. Important precautions or side effects
+5. When to take each medication
+
+Use simple, patient-friendly language."""
+
+_LAB_VISION_PROMPT = """Read this lab report and explain:
+1. What tests were performed
+2. Key findings and values
+3. Which values are normal vs abnormal
+4. What abnormal values might indicate
+5. General health implications
+
+Use simple language that patients can understand."""
+
+# Single-call vision prompts for when the category is already known
+_VISION_PROMPTS = {
+    'prescription': (_PRESCRIPTION_VISION_PROMPT, _PRESCRIPTION_SYSTEM),
+    'lab_report': (_LAB_VISION_PROMPT, _LAB_SYSTEM),
+    'medical_image': (_IMAGE_PROMPT, _IMAGE_SYSTEM)
+}
+
+_FUSED_PROMPT = """Step 1: Classify this medical document as exactly ONE of:
+PRESCRIPTION - Contains medication names, dosages, doctor's signature
+LAB_REPORT - Contains test results, lab values, pathology findings
+MEDICAL_IMAGE - X-ray, MRI, CT scan, ultrasound, or other diagnostic imaging
+UNKNOWN - None of the above
+
+Step 2: Produce a patient-friendly explanation appropriate to that category:
+- PRESCRIPTION: medications and their purposes, dosage instructions, duration, precautions or side effects, when to take each medication
+- LAB_REPORT: tests performed, key findings and values, normal vs abnormal values, what abnormal values might indicate, general health implications
+- MEDICAL_IMAGE: type of imaging, body part examined, visible findings, what they might mean, general observations
+- UNKNOWN: all visible information
+
+Use simple, reassuring language.
+
+Return strict JSON only: {"category": "<CATEGORY>", "explanation": "<explanation>"}
+Write line breaks inside the explanation as \\n escapes, not raw newlines."""
+
+_FUSED_SYSTEM = "You are a healthcare assistant classifying medical documents and explaining them to patients. Respond only with JSON."
+
+# Claude downsamples anything larger, so sending more pixels only costs upload time
+MAX_IMAGE_EDGE = 1568
+
+
+@lru_cache(maxsize=None)
+def get_analysis_cache() -> TTLCache:
+    """Return the process-wide cache of document analysis results."""
+    return TTLCache(ttl=ANALYSIS_CACHE_TTL)
+
+
+@lru_cache(maxsize=None)
+def get_prepared_image_cache() -> TTLCache:
+    """Return the process-wide cache of downscaled images keyed by the original upload."""
+    return TTLCache(ttl=PREPARED_IMAGE_CACHE_TTL, max_entries=32)
+
+
+def _prepare_image(image_bytes: bytes, media_type: str) -> Tuple[bytes, str]:
+    """
+    Downscale an image and re-encode it as JPEG without EXIF metadata.
+    
+    Args:
+        image_bytes: Binary image data
+        media_type: Image MIME type
+        
+    Returns:
+        Tuple of processed image data and its MIME type; unreadable input is returned unchanged
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+    except (OSError, ValueError):
+        return image_bytes, media_type
+    
+    return buffer.getvalue(), "image/jpeg"
 
 
 class DocumentAnalyzer:
@@ -11,7 +181,20 @@ class DocumentAnalyzer:
     def __init__(self):
         """Initialize with Bedrock client and Textract extractor."""
         self.bedrock = BedrockClient()
-        self.textract = TextractExtractor()
+        self.textract = get_textract_extractor()
+        self.cache = get_analysis_cache()
+        self.classifier_model = CLASSIFIER_MODEL_ID
+        self.last_category = 'lab_report'
+    
+    def _cached(self, name: str, image_data: bytes, compute: Callable[[], Any]) -> Any:
+        """Return the cached result of a named analysis step, computing it on a miss."""
+        key = f"{hashlib.sha256(image_data).hexdigest()}:{name}:v{PROMPT_VERSION}"
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.set(key, result)
+        # Hand out copies so callers mutating a result cannot corrupt the cached entry
+        return dict(result) if isinstance(result, dict) else result
     
     def categorize_document(self, image_data: bytes, media_type: str) -> dict:
         """
@@ -24,25 +207,26 @@ class DocumentAnalyzer:
         Returns:
             Dictionary with category and confidence
         """
+        return self._cached(
+            'categorize', image_data,
+            lambda: self._categorize_document(image_data, media_type)
+        )
+    
+    def _categorize_document(self, image_data: bytes, media_type: str) -> dict:
+        """Classify the document with Textract text and Bedrock."""
         # First extract text using Textract
         extracted_text = self.textract.extract_text(image_data)
         
         # Use both image and extracted text for better categorization
-        prompt = f"""Extracted text from document:
-{extracted_text[:1000]}
-
-Categorize this medical document into ONE of these types:
-1. PRESCRIPTION - Contains medication names, dosages, doctor's signature
-2. LAB_REPORT - Contains test results, lab values, pathology findings
-3. MEDICAL_IMAGE - X-ray, MRI, CT scan, ultrasound, or other diagnostic imaging
-
-Respond with ONLY: PRESCRIPTION, LAB_REPORT, or MEDICAL_IMAGE"""
-        
-        system_prompt = "You are a medical document classifier. Respond only with the category name."
+        prompt = _CATEGORIZE_PROMPT.format(extracted_text=extracted_text[:1000])
         
+        # One category word is all that is needed, so use the small model deterministically
         category = self.bedrock.invoke_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=_CATEGORIZE_SYSTEM,
+            model_id=self.classifier_model,
+            max_tokens=8,
+            temperature=0
         ).strip().upper()
         
         # Map to lowercase for consistency
@@ -68,6 +252,13 @@ Respond with ONLY: PRESCRIPTION, LAB_REPORT, or MEDICAL_IMAGE"""
         Returns:
             Detailed explanation of the prescription
         """
+        return self._cached(
+            'prescription', image_data,
+            lambda: self._explain_prescription(image_data, media_type)
+        )
+    
+    def _explain_prescription(self, image_data: bytes, media_type: str) -> str:
+        """Build the prescription explanation with Textract and Bedrock."""
         # Extract text using Textract for better accuracy
         extracted_data = self.textract.extract_structured_data(image_data)
         extracted_text = extracted_data['raw_text']
@@ -80,22 +271,11 @@ Respond with ONLY: PRESCRIPTION, LAB_REPORT, or MEDICAL_IMAGE"""
             for key, value in key_values.items():
                 context += f"- {key}: {value}\n"
         
-        prompt = f"""{context}
-
-Based on the extracted prescription data above, explain:
-1. Medications prescribed (names and purposes)
-2. Dosage instructions in simple terms
-3. Duration of treatment
-4. Important precautions or side effects
-5. When to take each medication
-
-Use simple, patient-friendly language."""
-        
-        system_prompt = "You are a compassionate healthcare assistant explaining prescriptions to patients."
+        prompt = _PRESCRIPTION_PROMPT.format(context=context)
         
         return self.bedrock.invoke_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=_PRESCRIPTION_SYSTEM
         )
     
     def explain_lab_report(self, image_data: bytes, media_type: str) -> str:
@@ -109,6 +289,13 @@ Use simple, patient-friendly language."""
         Returns:
             Detailed explanation of lab results
         """
+        return self._cached(
+            'lab_report', image_data,
+            lambda: self._explain_lab_report(image_data, media_type)
+        )
+    
+    def _explain_lab_report(self, image_data: bytes, media_type: str) -> str:
+        """Build the lab report explanation with Textract and Bedrock."""
         # Extract structured data using Textract
         extracted_data = self.textract.extract_structured_data(image_data)
         extracted_text = extracted_data['raw_text']
@@ -132,87 +319,205 @@ Use simple, patient-friendly language."""
                     context += " | ".join(row) + "\n"
                 context += "\n"
         
-        prompt = f"""{context}
-
-Based on the extracted lab report data above, explain:
-1. What tests were performed
-2. Key findings and values
-3. Which values are normal vs abnormal
-4. What abnormal values might indicate
-5. General health implications
-
-Use simple language that patients can understand."""
-        
-        system_prompt = "You are a healthcare assistant explaining lab results to patients in simple terms."
+        prompt = _LAB_PROMPT.format(context=context)
         
         return self.bedrock.invoke_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=_LAB_SYSTEM
         )
     
-    def explain_medical_image(self, image_data: bytes, media_type: str) -> str:
+    def explain_medical_image(self, image_data: bytes, media_type: str, _b64: Optional[str] = None) -> str:
         """
         Explain medical imaging results.
         
         Args:
             image_data: Binary medical image
             media_type: Image MIME type
+            _b64: Base64 encoding of image_data, if the caller already has it
             
         Returns:
             Explanation of the medical image
         """
-        prompt = """Analyze this medical image and explain:
-1. Type of imaging (X-ray, MRI, CT, etc.)
-2. Body part or area being examined
-3. Visible findings or abnormalities
-4. What these findings might mean
-5. General observations
-
-Use simple, reassuring language."""
+        return self._cached(
+            'medical_image', image_data,
+            lambda: self._explain_medical_image(image_data, media_type, _b64)
+        )
+    
+    def _explain_medical_image(self, image_data: bytes, media_type: str, _b64: Optional[str] = None) -> str:
+        """Build the medical image explanation with the vision model."""
+        return self.bedrock.invoke_with_b64image(
+            prompt=_IMAGE_PROMPT,
+            image_base64=_b64 or base64.b64encode(image_data).decode('utf-8'),
+            media_type=media_type,
+            system_prompt=_IMAGE_SYSTEM
+        )
+    
+    def explain_by_category(self, category: str, image_data: bytes, media_type: str,
+                            _b64: Optional[str] = None) -> str:
+        """
+        Explain a document using the method matching its category.
         
-        system_prompt = "You are a healthcare assistant explaining medical images to patients."
+        Args:
+            category: Document category from categorize_document
+            image_data: Binary image data
+            media_type: Image MIME type
+            _b64: Base64 encoding of image_data, if the caller already has it
+            
+        Returns:
+            Category-specific explanation
+        """
+        if category == 'prescription':
+            return self.explain_prescription(image_data, media_type)
+        elif category == 'medical_image':
+            return self.explain_medical_image(image_data, media_type, _b64=_b64)
+        # Fallback: try lab report analysis
+        return self.explain_lab_report(image_data, media_type)
+    
+    def explain_with_vision(self, category: str, image_data: bytes, media_type: str,
+                            _b64: Optional[str] = None) -> str:
+        """
+        Explain a document of known category with one vision call and no Textract.
         
-        return self.bedrock.invoke_with_image(
-            prompt=prompt,
-            image_data=image_data,
+        Args:
+            category: Document category, e.g. from category_from_prompt
+            image_data: Binary image data
+            media_type: Image MIME type
+            _b64: Base64 encoding of image_data, if the caller already has it
+            
+        Returns:
+            Category-specific explanation
+        """
+        prompt, system_prompt = _VISION_PROMPTS[category]
+        return self._cached(
+            f'vision_{category}', image_data,
+            lambda: self.bedrock.invoke_with_b64image(
+                prompt=prompt,
+                image_base64=_b64 or base64.b64encode(image_data).decode('utf-8'),
+                media_type=media_type,
+                system_prompt=system_prompt
+            )
+        )
+    
+    def analyze_document_fused(self, image_data: bytes, media_type: str, _b64: Optional[str] = None) -> dict:
+        """
+        Categorize and explain a document with a single vision model call.
+        
+        Args:
+            image_data: Binary image data
+            media_type: Image MIME type
+            _b64: Base64 encoding of image_data, if the caller already has it
+            
+        Returns:
+            Dictionary with category and explanation
+            
+        Raises:
+            ValueError: If the model reply contains no usable JSON
+        """
+        return self._cached(
+            'fused', image_data,
+            lambda: self._analyze_document_fused(image_data, media_type, _b64)
+        )
+    
+    def _analyze_document_fused(self, image_data: bytes, media_type: str, _b64: Optional[str] = None) -> dict:
+        """Classify and explain the document in one Bedrock round trip."""
+        reply = self.bedrock.invoke_with_b64image(
+            prompt=_FUSED_PROMPT,
+            image_base64=_b64 or base64.b64encode(image_data).decode('utf-8'),
             media_type=media_type,
-            system_prompt=system_prompt
+            system_prompt=_FUSED_SYSTEM
         )
+        
+        try:
+            result = json.loads(reply, strict=False)
+        except json.JSONDecodeError:
+            # Models sometimes wrap the JSON in prose or code fences; strict=False
+            # above and below tolerates raw newlines inside the explanation string
+            match = re.search(r'\{.*\}', reply, re.DOTALL)
+            if not match:
+                raise ValueError("Fused analysis reply contained no JSON")
+            result = json.loads(match.group(0), strict=False)
+        
+        category_display = str(result.get('category', 'UNKNOWN')).strip().upper()
+        explanation = result.get('explanation')
+        if not explanation:
+            raise ValueError("Fused analysis reply contained no explanation")
+        
+        return {
+            'category': DOCUMENT_CATEGORIES.get(category_display, 'unknown'),
+            'category_display': category_display,
+            'explanation': explanation
+        }
     
-    def analyze_document(self, image_data: bytes, media_type: str) -> dict:
+    def analyze_document(self, image_data: bytes, media_type: str, user_prompt: str = "") -> dict:
         """
         Complete document analysis pipeline: categorize and explain.
         
         Args:
             image_data: Binary image data
             media_type: Image MIME type
+            user_prompt: User's request, used to skip categorization when it names the type
             
         Returns:
             Dictionary with category and explanation
         """
-        # Step 1: Categorize the document
-        categorization = self.categorize_document(image_data, media_type)
-        category = categorization['category']
+        # Shrink once here so every Textract and Bedrock call below reuses the small copy;
+        # repeat uploads reuse the shrunk copy so cache hits never pay for PIL
+        original_key = hashlib.sha256(image_data).hexdigest()
+        prepared_cache = get_prepared_image_cache()
+        prepared = prepared_cache.get(original_key)
+        if prepared is None:
+            prepared = _prepare_image(image_data, media_type)
+            prepared_cache.set(original_key, prepared)
+        image_data, media_type = prepared
+        b64 = base64.b64encode(image_data).decode('utf-8')
+        
+        category = category_from_prompt(user_prompt)
+        if category:
+            try:
+                return {
+                    'category': category,
+                    'category_display': category.upper(),
+                    'explanation': self.explain_with_vision(category, image_data, media_type, _b64=b64)
+                }
+            except Exception:
+                # Fall through to the full pipeline, which has its own fallbacks
+                pass
         
-        # Step 2: Generate appropriate explanation based on category
         try:
-            if category == 'prescription':
-                explanation = self.explain_prescription(image_data, media_type)
-            elif category == 'lab_report':
-                explanation = self.explain_lab_report(image_data, media_type)
-            elif category == 'medical_image':
-                explanation = self.explain_medical_image(image_data, media_type)
-            else:
-                # Fallback: try lab report analysis
-                explanation = self.explain_lab_report(image_data, media_type)
-        except Exception as e:
-            # If Textract or analysis fails, use vision model as fallback
-            explanation = self.bedrock.invoke_with_image(
-                prompt="Analyze this medical document and explain all visible information in simple, patient-friendly terms.",
-                image_data=image_data,
-                media_type=media_type,
-                system_prompt="You are a healthcare assistant explaining medical documents to patients."
-            )
+            return self.analyze_document_fused(image_data, media_type, _b64=b64)
+        except Exception:
+            # Fall back to separate categorization and explanation calls
+            return self._analyze_document_two_step(image_data, media_type, b64)
+    
+    def _analyze_document_two_step(self, image_data: bytes, media_type: str, b64: str) -> dict:
+        """Categorize and explain with separate Bedrock calls."""
+        # Categorize and speculatively explain as the last seen category in parallel
+        guess = self.last_category
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            categorize_future = pool.submit(self.categorize_document, image_data, media_type)
+            explain_future = pool.submit(self.explain_by_category, guess, image_data, media_type, b64)
+            
+            categorization = categorize_future.result()
+            category = categorization['category']
+            self.last_category = category
+            
+            try:
+                if category == guess:
+                    explanation = explain_future.result()
+                else:
+                    explanation = self.explain_by_category(category, image_data, media_type, _b64=b64)
+            except Exception as e:
+                # If Textract or analysis fails, use vision model as fallback
+                explanation = self.bedrock.invoke_with_b64image(
+                    prompt="Analyze this medical document and explain all visible information in simple, patient-friendly terms.",
+                    image_base64=b64,
+                    media_type=media_type,
+                    system_prompt="You are a healthcare assistant explaining medical documents to patients."
+                )
+        finally:
+            # A mispredicted explanation keeps running and lands in the cache
+            pool.shutdown(wait=False)
         
         return {
             'category': category,
@@ -0,0 +1,217 @@
+"""Response caching module for reusing Bedrock model outputs."""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """Caches model responses by exact prompt hash and embedding similarity."""
+    
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.92,
+                 ttl: int = 3600, max_entries: int = 512):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            embed_fn: Function returning an embedding vector for a prompt
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl: Seconds a cached response stays valid
+            max_entries: Maximum number of cached responses in each of the
+                exact and semantic indexes, across all scopes
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._partitions = {}
+        self._semantic_count = 0
+    
+    def get_or_compute(self, prompt: str, compute_fn: Callable[[], str],
+                       query: Optional[str] = None, scope: str = "") -> str:
+        """
+        Return a cached response for the prompt, computing it on a miss.
+        
+        Args:
+            prompt: Full prompt sent to the model
+            compute_fn: Function invoking the model when nothing matches
+            query: Text embedded for similarity matching; defaults to prompt
+            scope: Text whose hash partitions the semantic index, so only
+                responses stored under the same scope can match
+            
+        Returns:
+            Cached or freshly computed model response
+        """
+        key, partition = self._keys(prompt, scope)
+        response, embedding = self._lookup(key, partition, prompt if query is None else query)
+        if response is not None:
+            return response
+        
+        response = compute_fn()
+        self._store(key, partition, embedding, response)
+        return response
+    
+    def stream_through(self, prompt: str, stream_fn: Callable[[], Iterator[str]],
+                       query: Optional[str] = None, scope: str = "") -> Iterator[str]:
+        """
+        Stream a cached response for the prompt, or stream and cache a fresh one.
+        
+        Args:
+            prompt: Full prompt sent to the model
+            stream_fn: Function returning an iterator of response text deltas
+            query: Text embedded for similarity matching; defaults to prompt
+            scope: Text whose hash partitions the semantic index
+            
+        Yields:
+            Response text; a cached response is yielded as a single chunk
+        """
+        key, partition = self._keys(prompt, scope)
+        response, embedding = self._lookup(key, partition, prompt if query is None else query)
+        if response is not None:
+            yield response
+            return
+        
+        chunks = []
+        for chunk in stream_fn():
+            chunks.append(chunk)
+            yield chunk
+        # Only reached when the stream completed, so partial replies are never cached
+        self._store(key, partition, embedding, "".join(chunks))
+    
+    def _keys(self, prompt: str, scope: str) -> Tuple[str, str]:
+        """Hash the prompt and scope into exact and partition keys."""
+        return (hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+                hashlib.sha256(scope.encode('utf-8')).hexdigest())
+    
+    def _lookup(self, key: str, partition: str, query: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Find a cached response; also returns the query embedding for storing a miss."""
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    return entry[0], None
+                del self._exact[key]
+        
+        embedding = self._embed(query)
+        if embedding is not None:
+            with self._lock:
+                index = self._partitions.get(partition)
+                if index is not None:
+                    self._evict_expired(partition, index)
+                if index is not None and index['responses']:
+                    scores = index['matrix'][:len(index['responses'])] @ embedding
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        return index['responses'][best], embedding
+        
+        return None, embedding
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize text; None if embedding is unavailable."""
+        try:
+            vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception:
+            return None
+        
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+    
+    def _store(self, key: str, partition: str, embedding: Optional[np.ndarray], response: str):
+        """Add a response to the exact index and its partition's semantic index."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._exact.pop(key, None)
+            self._exact[key] = (response, expires_at)
+            while len(self._exact) > self.max_entries:
+                self._exact.pop(next(iter(self._exact)))
+            if embedding is None:
+                return
+            
+            index = self._partitions.pop(partition, None)
+            if index is None:
+                index = {'responses': [], 'expires': [], 'matrix': None}
+            # Re-insert so partitions stay ordered from least to most recently written
+            self._partitions[partition] = index
+            self._evict_expired(partition, index)
+            
+            size = len(index['responses'])
+            matrix = index['matrix']
+            if matrix is None or size == matrix.shape[0]:
+                # Grow geometrically so inserts do not copy the whole matrix each time
+                grown = np.empty((max(8, size * 2), embedding.shape[0]), dtype=np.float32)
+                if size:
+                    grown[:size] = matrix[:size]
+                index['matrix'] = matrix = grown
+            matrix[size] = embedding
+            index['responses'].append(response)
+            index['expires'].append(expires_at)
+            self._semantic_count += 1
+            
+            # One cap across all scopes: evict the oldest entry of the stalest partition
+            while self._semantic_count > self.max_entries:
+                oldest = next(iter(self._partitions))
+                self._drop(oldest, self._partitions[oldest], [0])
+    
+    def _evict_expired(self, partition: str, index: dict):
+        """Drop expired entries from one partition. Caller must hold the lock."""
+        now = time.time()
+        expired = [i for i, expires_at in enumerate(index['expires']) if expires_at <= now]
+        if expired:
+            self._drop(partition, index, expired)
+    
+    def _drop(self, partition: str, index: dict, positions):
+        """Remove semantic entries from one partition by position. Caller must hold the lock."""
+        drop = set(positions)
+        keep = [i for i in range(len(index['responses'])) if i not in drop]
+        self._semantic_count -= len(index['responses']) - len(keep)
+        if not keep:
+            self._partitions.pop(partition, None)
+            index['responses'], index['expires'], index['matrix'] = [], [], None
+            return
+        index['responses'] = [index['responses'][i] for i in keep]
+        index['expires'] = [index['expires'][i] for i in keep]
+        index['matrix'] = index['matrix'][keep]
+
+
+class TTLCache:
+    """Thread-safe exact-match cache whose entries expire after a fixed TTL."""
+    
+    def __init__(self, ttl: int, max_entries: int = 256):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Maximum number of cached entries
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            return value
+    
+    def set(self, key: str, value: Any):
+        """Store value under key, evicting the oldest entry when full."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.time() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
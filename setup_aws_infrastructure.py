@@ -151,6 +151,7 @@ def setup_iam_policy():
                 "Effect": "Allow",
                 "Action": [
                     "bedrock:InvokeModel",
+                    "bedrock:InvokeModelWithResponseStream",
                     "bedrock:Retrieve"
                 ],
                 "Resource": [
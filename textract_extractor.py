@@ -1,8 +1,24 @@
 """Amazon Textract module for robust text extraction from medical documents."""
 
 import boto3
+import copy
+import hashlib
+from functools import lru_cache
 from typing import Dict, List
-from config import AWS_REGION
+from config import AWS_REGION, TEXTRACT_CACHE_TTL
+from response_cache import TTLCache
+
+
+@lru_cache(maxsize=None)
+def get_extraction_cache() -> TTLCache:
+    """Return the process-wide cache of Textract results keyed by image content."""
+    return TTLCache(ttl=TEXTRACT_CACHE_TTL)
+
+
+@lru_cache(maxsize=None)
+def get_textract_extractor() -> 'TextractExtractor':
+    """Return a shared extractor so the boto3 client and its connection pool are reused."""
+    return TextractExtractor()
 
 
 class TextractExtractor:
@@ -11,6 +27,7 @@ class TextractExtractor:
     def __init__(self):
         """Initialize Textract client."""
         self.client = boto3.client('textract', region_name=AWS_REGION)
+        self.cache = get_extraction_cache()
     
     def extract_text(self, image_data: bytes) -> str:
         """
@@ -22,6 +39,11 @@ class TextractExtractor:
         Returns:
             Extracted text content
         """
+        key = f"text:{hashlib.sha256(image_data).hexdigest()}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
         response = self.client.detect_document_text(
             Document={'Bytes': image_data}
         )
@@ -32,7 +54,9 @@ class TextractExtractor:
             if block['BlockType'] == 'LINE':
                 text_lines.append(block['Text'])
         
-        return '\n'.join(text_lines)
+        text = '\n'.join(text_lines)
+        self.cache.set(key, text)
+        return text
     
     def extract_structured_data(self, image_data: bytes) -> Dict:
         """
@@ -44,6 +68,12 @@ class TextractExtractor:
         Returns:
             Dictionary with extracted text, key-value pairs, and tables
         """
+        key = f"structured:{hashlib.sha256(image_data).hexdigest()}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            # Nested tables and key-value pairs are mutable, so never hand out the cached object
+            return copy.deepcopy(cached)
+        
         response = self.client.analyze_document(
             Document={'Bytes': image_data},
             FeatureTypes=['FORMS', 'TABLES']
@@ -82,11 +112,13 @@ class TextractExtractor:
             if table_data:
                 tables.append(table_data)
         
-        return {
+        result = {
             'raw_text': '\n'.join(text_lines),
             'key_value_pairs': key_value_pairs,
             'tables': tables
         }
+        self.cache.set(key, result)
+        return copy.deepcopy(result)
     
     def _get_text_from_block(self, block: Dict, block_map: Dict) -> str:
         """Extract text from a block using relationships."""